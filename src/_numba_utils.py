@@ -0,0 +1,15 @@
+# _numba_utils.py
+# =============================================================================
+# OPTIONAL NUMBA SUPPORT
+# numba compiles numeric kernels to native code when it is installed.
+# Without it, the stand-in below is a no-op and kernels run as plain Python.
+# =============================================================================
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit (supports @njit and @njit(...))."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
@@ -7,9 +7,40 @@
 # Reference: Conceptual framework for self-improving agents
 # =============================================================================
 
-import random
-from typing import List, Tuple
-from genome import PromptGenome
+import heapq
+import itertools
+import math
+import multiprocessing
+from collections import Counter, deque
+from operator import itemgetter
+from typing import Counter as CounterType, Deque, Iterable, List, Optional, Tuple
+import numpy as np
+from genome import FRAGMENT_DTYPE, PromptGenome, Population
+from evaluator import Evaluator
+from _numba_utils import njit
+
+
+def _island_worker(args: tuple) -> tuple:
+    """
+    Run one island for several generations inside a worker process.
+    The island's engine and evaluator travel with the task and are sent
+    back, so their state (Commons, RNG streams, score cache) persists.
+    """
+    engine, evaluator, population, task, mode, generations = args
+    for _ in range(generations):
+        population, _ = engine.evaluate_and_evolve(population, evaluator, task, mode)
+    # Score the final population so the master can pick migrants
+    scores = evaluator.evaluate_batch(population, task)
+    return engine, evaluator, population, scores
+
+
+@njit(cache=True, fastmath=True)
+def mean_fitness(scores: np.ndarray) -> float:
+    """Average of a float64 score array (0.0 when empty)."""
+    total = 0.0
+    for score in scores:
+        total += score
+    return total / scores.size if scores.size else 0.0
 
 
 class EvolutionaryEngine:
@@ -21,22 +52,57 @@ class EvolutionaryEngine:
     - 'kropotkin': Cooperative selection, shared knowledge pool (Commons)
     """
     
-    def __init__(self, population_size: int = 5, commons_size: int = 10):
+    def __init__(
+        self, 
+        population_size: int = 5, 
+        commons_size: int = 10,
+        seed: Optional[int] = None,
+        mutation_rate: float = 0.2,
+        inheritance_prob: float = 0.5
+    ):
         """
         Initialize the evolutionary engine.
         
         Args:
             population_size: Number of individuals in each generation.
             commons_size: Maximum size of the shared knowledge pool.
+            seed: Optional seed for reproducible runs.
+            mutation_rate: Probability that a child is mutated.
+            inheritance_prob: Probability that an unmutated child inherits
+                its better parent's fitness instead of being evaluated.
         """
         self.population_size = population_size
-        self.commons: List[int] = []  # Shared fragment pool (Kropotkin)
+        # Shared fragment pool (Kropotkin); oldest fragments drop off when full
+        self.commons: Deque[int] = deque(maxlen=commons_size)
         self.commons_max_size = commons_size
+        # Array mirror of the Commons for batched sampling
+        self._commons_arr = np.empty(0, dtype=FRAGMENT_DTYPE)
         self.generation_count = 0
+        # Fragment counts of the population evolved by this engine, updated
+        # incrementally (only for individuals that change)
+        self.fragment_counter: CounterType[int] = Counter()
+        self.mutation_rate = mutation_rate
+        self.inheritance_prob = inheritance_prob
+        self._np_rng = np.random.default_rng(seed)
     
     def create_initial_population(self) -> List[PromptGenome]:
         """Generate the initial random population."""
-        return [PromptGenome() for _ in range(self.population_size)]
+        population = Population.random(self.population_size, self._np_rng)
+        self.fragment_counter = Counter(population.fragments.ravel().tolist())
+        return population.to_genomes()
+    
+    def _update_fragment_counts(
+        self, 
+        removed: Iterable[int], 
+        added: Iterable[int]
+    ) -> None:
+        """Apply a delta to fragment_counter, dropping fragments that reach zero."""
+        counter = self.fragment_counter
+        for fragment in removed:
+            counter[fragment] -= 1
+            if counter[fragment] <= 0:
+                del counter[fragment]
+        counter.update(added)
     
     def _evaluate_population(
         self, 
@@ -45,7 +111,50 @@ class EvolutionaryEngine:
         task: str
     ) -> List[float]:
         """Evaluate fitness for all individuals in the population."""
-        return [evaluator.evaluate(ind, task) for ind in population]
+        # Real (I/O-bound) scoring is fanned out concurrently, under its
+        # rate limit, by evaluate_batch
+        return evaluator.evaluate_batch(population, task)
+    
+    def score_population(
+        self, 
+        population: List[PromptGenome], 
+        evaluator, 
+        task: str
+    ) -> List[float]:
+        """
+        Fitness scores for the population, skipping evaluations when possible.
+        
+        Unchanged individuals are served from the evaluator's score cache.
+        Children tagged with parent_fitness inherit it instead of being
+        evaluated with probability inheritance_prob (fitness inheritance).
+        
+        Args:
+            population: Current generation.
+            evaluator: Evaluator used for the remaining individuals.
+            task: The task/question to assess.
+            
+        Returns:
+            List of fitness scores, aligned with population.
+        """
+        inherit = self._np_rng.random(len(population)) < self.inheritance_prob
+        scores: List[Optional[float]] = [
+            ind.parent_fitness if use_parent else None
+            for ind, use_parent in zip(population, inherit.tolist())
+        ]
+        
+        pending = [i for i, score in enumerate(scores) if score is None]
+        if pending:
+            new_scores = self._evaluate_population(
+                [population[i] for i in pending], evaluator, task
+            )
+            for i, score in zip(pending, new_scores):
+                scores[i] = score
+        
+        # An inherited estimate is used once; survivors get a real score later
+        for ind in population:
+            ind.parent_fitness = None
+        
+        return scores
     
     def select_darwin(
         self, 
@@ -64,16 +173,14 @@ class EvolutionaryEngine:
         Returns:
             List of surviving individuals.
         """
-        # Rank by fitness (highest first)
-        ranked = sorted(
+        # Keep top performers (partial ranking, highest first)
+        num_survivors = max(1, int(len(population) * survival_rate))
+        ranked = heapq.nlargest(
+            num_survivors, 
             zip(population, scores), 
-            key=lambda x: x[1], 
-            reverse=True
+            key=lambda x: x[1]
         )
-        
-        # Keep top performers
-        num_survivors = max(1, int(len(population) * survival_rate))
-        survivors = [ind for ind, _ in ranked[:num_survivors]]
+        survivors = [ind for ind, _ in ranked]
         
         return survivors
     
@@ -94,64 +201,111 @@ class EvolutionaryEngine:
         Returns:
             List of individuals (all survive, but may adopt shared genes).
         """
-        # Step 1: Best individuals contribute to the Commons
-        ranked = sorted(
-            zip(population, scores), 
-            key=lambda x: x[1], 
-            reverse=True
-        )
-        
-        if ranked:
-            best_genome = ranked[0][0]
-            # Add best fragments to shared pool
+        # Step 1: Best individual contributes to the Commons
+        if population:
+            best_genome, _ = max(zip(population, scores), key=lambda x: x[1])
+            # Add best fragments to shared pool (bounded by the deque's maxlen)
             self.commons.extend(best_genome.genes['fragments'])
-            # Limit commons size to prevent bloat
-            if len(self.commons) > self.commons_max_size:
-                self.commons = self.commons[-self.commons_max_size:]
+            self._commons_arr = np.fromiter(
+                self.commons, 
+                dtype=FRAGMENT_DTYPE, 
+                count=len(self.commons)
+            )
         
         # Step 2: All individuals survive, but may adopt from Commons
-        survivors = []
-        for ind in population:
-            if self.commons and random.random() < sharing_probability:
+        if len(self._commons_arr):
+            # Draw who adopts and what they adopt for the whole population at once
+            adopt_mask = self._np_rng.random(len(population)) < sharing_probability
+            choices = self._np_rng.choice(
+                self._commons_arr, 
+                size=int(adopt_mask.sum())
+            )
+            for ind, fragment in zip(
+                itertools.compress(population, adopt_mask), 
+                choices.tolist()
+            ):
                 # Adopt a random fragment from the Commons
-                ind.genes['fragments'][0] = random.choice(self.commons)
-            survivors.append(ind)
+                self._update_fragment_counts([ind.genes['fragments'][0]], [fragment])
+                ind.set_fragment(0, fragment)
+        survivors = list(population)
         
         return survivors
     
     def _reproduce(
         self, 
         survivors: List[PromptGenome], 
-        mode: str
-    ) -> List[PromptGenome]:
+        mode: str,
+        survivor_scores: Optional[List[Optional[float]]] = None
+    ) -> Tuple[List[PromptGenome], Optional[np.ndarray]]:
         """
         Generate new individuals through crossover and mutation.
         
         Args:
             survivors: Individuals selected for reproduction.
             mode: Evolutionary mode ('darwin' or 'kropotkin').
+            survivor_scores: Optional fitness of each survivor (None if
+                unknown). Unmutated children are tagged with their better
+                parent's score (parent_fitness), for fitness inheritance.
             
         Returns:
-            New population at target size.
+            Tuple of (new population at target size, better-parent score of
+            each child (NaN if neither parent's is known), or None without
+            survivor_scores).
         """
-        next_generation = survivors.copy()
+        n_children = self.population_size - len(survivors)
+        if n_children <= 0:
+            return list(survivors), np.empty(0)
         
-        while len(next_generation) < self.population_size:
-            # Select two random parents from survivors
-            parent1, parent2 = random.sample(survivors, 2)
-            
-            # Create child via crossover
-            child = parent1.crossover(parent2)
-            
-            # Apply mutation
-            child.mutate()
-            
-            # Set mode for child
-            child.genes['mode'] = mode
-            
-            next_generation.append(child)
+        # Draw all parent pairs at once and cross them over as arrays
+        parents = Population.from_genomes(survivors)
+        pairs = self._draw_parent_pairs(len(survivors), n_children)
+        children = parents.crossover(pairs, mode)
         
-        return next_generation
+        # Apply mutation to all children at once
+        mutated = children.mutate_batch(self.mutation_rate, self._np_rng)
+        child_genomes = children.to_genomes()
+        
+        inherited = None
+        if survivor_scores is not None:
+            parent_scores = np.array(
+                [np.nan if score is None else score for score in survivor_scores], 
+                dtype=np.float64
+            )
+            # fmax skips a parent with an unknown (NaN) score
+            inherited = np.fmax(parent_scores[pairs[:, 0]], parent_scores[pairs[:, 1]])
+            for child, fitness, was_mutated in zip(
+                child_genomes, inherited.tolist(), mutated.tolist()
+            ):
+                # A mutated child may score nothing like its parents
+                if not was_mutated and not math.isnan(fitness):
+                    child.parent_fitness = fitness
+        
+        # Single exact-size allocation (no copy followed by per-child appends)
+        return survivors + child_genomes, inherited
+    
+    def _draw_parent_pairs(self, num_parents: int, num_pairs: int) -> np.ndarray:
+        """
+        Draw (num_pairs, 2) parent indices, two distinct parents per pair
+        (same distribution as random.sample(parents, 2)).
+        """
+        first = self._np_rng.integers(0, num_parents, size=num_pairs)
+        if num_parents < 2:
+            return np.stack([first, first], axis=1)
+        # A non-zero offset modulo num_parents never picks the same parent twice
+        offset = self._np_rng.integers(1, num_parents, size=num_pairs)
+        return np.stack([first, (first + offset) % num_parents], axis=1)
+    
+    def _select(
+        self, 
+        population: List[PromptGenome], 
+        scores: List[float], 
+        mode: str
+    ) -> List[PromptGenome]:
+        """Dispatch to the selection operator for the given mode."""
+        if mode == 'darwin':
+            return self.select_darwin(population, scores)
+        else:  # kropotkin
+            return self.select_kropotkin(population, scores)
     
     def evolve_generation(
         self, 
@@ -170,22 +324,291 @@ class EvolutionaryEngine:
         Returns:
             New generation after selection and reproduction.
         """
+        return self.evolve_generation_with_scores(population, scores, mode)[0]
+    
+    def evolve_generation_with_scores(
+        self, 
+        population: List[PromptGenome], 
+        scores: List[float], 
+        mode: str = 'darwin'
+    ) -> Tuple[List[PromptGenome], List[Optional[float]]]:
+        """
+        Execute one full generation of evolution and estimate the new
+        generation's scores without evaluating it.
+        
+        Survivors with unchanged genes keep their score and children take
+        their better parent's. Survivors whose genes changed during selection
+        (Kropotkin adoption) get None and pass no estimate on.
+        
+        Args:
+            population: Current generation.
+            scores: Fitness scores.
+            mode: 'darwin' or 'kropotkin'.
+            
+        Returns:
+            Tuple of (new generation, estimated scores, None where unknown).
+        """
         self.generation_count += 1
+        # Selection may rewrite fragments in place; remember the scored genes
+        scored = {
+            id(ind): (score, tuple(ind.genes['fragments'])) 
+            for ind, score in zip(population, scores)
+        }
         
         # Step 1: Selection based on mode
-        if mode == 'darwin':
-            survivors = self.select_darwin(population, scores)
-        else:  # kropotkin
-            survivors = self.select_kropotkin(population, scores)
+        survivors = self._select(population, scores, mode)
         
         # Step 2: Reproduction to restore population size
-        next_generation = self._reproduce(survivors, mode)
+        survivor_scores = []
+        for ind in survivors:
+            score, fragments = scored[id(ind)]
+            unchanged = tuple(ind.genes['fragments']) == fragments
+            survivor_scores.append(score if unchanged else None)
+        next_generation, child_scores = self._reproduce(
+            survivors, 
+            mode, 
+            survivor_scores
+        )
+        
+        # Step 3: Track fragment counts for culled and newborn individuals only
+        survivor_ids = {id(ind) for ind in survivors}
+        self._update_fragment_counts(
+            (f for ind in population if id(ind) not in survivor_ids 
+             for f in ind.genes['fragments']),
+            (f for ind in next_generation[len(survivors):] 
+             for f in ind.genes['fragments'])
+        )
+        
+        child_estimates = [
+            None if math.isnan(score) else score for score in child_scores.tolist()
+        ]
+        return next_generation, survivor_scores + child_estimates
+    
+    def evaluate_and_evolve(
+        self, 
+        population: List[PromptGenome], 
+        evaluator, 
+        task: str, 
+        mode: str = 'darwin'
+    ) -> Tuple[List[PromptGenome], List[float]]:
+        """
+        Evaluate the population and execute one generation in a single call.
+        
+        Args:
+            population: Current generation.
+            evaluator: Evaluator used to score the population.
+            task: The task/question to assess.
+            mode: 'darwin' or 'kropotkin'.
+            
+        Returns:
+            Tuple of (new generation, fitness scores of the current one).
+        """
+        scores = self.score_population(population, evaluator, task)
+        return self.evolve_generation(population, scores, mode), scores
+    
+    def get_diversity(self, population: Optional[List[PromptGenome]] = None) -> int:
+        """
+        Number of distinct fragments across the population.
+        
+        Args:
+            population: Population to scan. If omitted, the O(1) incremental
+                count for the population evolved by this engine is used.
+        """
+        if population is None:
+            return len(self.fragment_counter)
         
-        return next_generation
+        return len(frozenset().union(*(ind.fragment_set for ind in population)))
+    
+    def get_fragment_entropy(self) -> float:
+        """Shannon entropy (bits) of the fragment distribution in the population."""
+        counts = np.fromiter(self.fragment_counter.values(), dtype=np.float64)
+        if counts.size == 0:
+            return 0.0
+        p = counts / counts.sum()
+        return float(-(p * np.log2(p)).sum())
     
-    def get_commons_stats(self) -> dict:
-        """Return statistics about the shared knowledge pool."""
-        return {
+    def get_commons_stats(
+        self, 
+        population: Optional[List[PromptGenome]] = None
+    ) -> dict:
+        """
+        Return statistics about the shared knowledge pool.
+        
+        Args:
+            population: Optional population; adds how many Commons
+                fragments it currently carries ('commons_in_population').
+        """
+        commons = frozenset(self.commons)
+        stats = {
             'commons_size': len(self.commons),
-            'unique_fragments': len(set(self.commons)) if self.commons else 0
+            'unique_fragments': len(commons)
         }
+        if population is not None:
+            carried = frozenset().union(*(ind.fragment_set for ind in population))
+            stats['commons_in_population'] = len(commons & carried)
+        return stats
+
+
+class IslandEngine:
+    """
+    Island model: several independent EvolutionaryEngines ("islands")
+    evolve in parallel processes and periodically exchange their best
+    individuals (migration).
+    
+    Migration topologies:
+    - 'ring': island i receives the best individual of island i-1
+    - 'fully_connected': island i receives the best of a random other island
+    """
+    
+    TOPOLOGIES = ('ring', 'fully_connected')
+    
+    def __init__(
+        self, 
+        num_islands: int = 4, 
+        population_size: int = 5,
+        migration_interval: int = 5,
+        migration_topology: str = 'ring',
+        processes: Optional[int] = None,
+        use_mock: bool = True,
+        seed: Optional[int] = None
+    ):
+        """
+        Initialize the island model.
+        
+        Args:
+            num_islands: Number of independent sub-populations.
+            population_size: Number of individuals on each island.
+            migration_interval: Generations between migrations.
+            migration_topology: 'ring' or 'fully_connected'.
+            processes: Worker process count (default: num_islands).
+            use_mock: Evaluator mode used on every island.
+            seed: Optional seed for reproducible runs.
+        """
+        if migration_topology not in self.TOPOLOGIES:
+            raise ValueError(
+                f"Unknown migration topology: {migration_topology!r} "
+                f"(expected one of {self.TOPOLOGIES})"
+            )
+        if migration_interval < 1:
+            raise ValueError(
+                f"migration_interval must be at least 1, got {migration_interval!r}"
+            )
+        
+        self.migration_interval = migration_interval
+        self.migration_topology = migration_topology
+        self.processes = processes or num_islands
+        self.generation_count = 0
+        
+        # Independent RNG streams for every island, and within an island
+        # separate ones for its engine and its evaluator
+        seed_seq = np.random.SeedSequence(seed)
+        island_seeds = [
+            [int(child.generate_state(1)[0]) for child in island_seq.spawn(2)]
+            for island_seq in seed_seq.spawn(num_islands)
+        ]
+        self._np_rng = np.random.default_rng(seed_seq)
+        
+        self.islands = [
+            EvolutionaryEngine(population_size=population_size, seed=engine_seed)
+            for engine_seed, _ in island_seeds
+        ]
+        self.evaluators = [
+            Evaluator(use_mock=use_mock, seed=evaluator_seed) 
+            for _, evaluator_seed in island_seeds
+        ]
+        self.populations = [
+            engine.create_initial_population() for engine in self.islands
+        ]
+        self.scores: List[List[float]] = [[] for _ in self.islands]
+    
+    def evolve(self, task: str, generations: int, mode: str = 'darwin') -> None:
+        """
+        Evolve all islands, migrating every migration_interval generations.
+        
+        Args:
+            task: The task/question to assess.
+            generations: Number of generations to run on every island.
+            mode: 'darwin' or 'kropotkin'.
+        """
+        remaining = generations
+        pool = None
+        if self.processes > 1 and len(self.islands) > 1:
+            pool = multiprocessing.Pool(min(self.processes, len(self.islands)))
+        
+        try:
+            while remaining > 0:
+                epoch = min(self.migration_interval, remaining)
+                payloads = [
+                    (engine, evaluator, population, task, mode, epoch)
+                    for engine, evaluator, population in zip(
+                        self.islands, self.evaluators, self.populations
+                    )
+                ]
+                
+                if pool is None:
+                    results = [_island_worker(payload) for payload in payloads]
+                else:
+                    pending = [
+                        pool.apply_async(_island_worker, (payload,)) 
+                        for payload in payloads
+                    ]
+                    results = [result.get() for result in pending]
+                
+                for i, (engine, evaluator, population, scores) in enumerate(results):
+                    self.islands[i] = engine
+                    self.evaluators[i] = evaluator
+                    self.populations[i] = population
+                    self.scores[i] = scores
+                
+                remaining -= epoch
+                self.generation_count += epoch
+                if epoch == self.migration_interval:
+                    self._migrate()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    
+    def _migrate(self) -> None:
+        """Replace each island's worst individual with a migrant's copy."""
+        num_islands = len(self.islands)
+        if num_islands < 2:
+            return
+        
+        # Only the best individual of each island travels (tiny payload)
+        bests = [
+            max(zip(population, scores), key=itemgetter(1))
+            for population, scores in zip(self.populations, self.scores)
+        ]
+        
+        for i, (population, scores) in enumerate(zip(self.populations, self.scores)):
+            if self.migration_topology == 'ring':
+                source = (i - 1) % num_islands
+            else:  # fully_connected
+                source = (i + int(self._np_rng.integers(1, num_islands))) % num_islands
+            migrant, migrant_score = bests[source]
+            
+            worst = min(range(len(scores)), key=scores.__getitem__)
+            self.islands[i]._update_fragment_counts(
+                population[worst].genes['fragments'], 
+                migrant.genes['fragments']
+            )
+            population[worst] = PromptGenome._from_arrays(
+                list(migrant.genes['fragments']),
+                migrant.genes['temperature'],
+                migrant.genes['mode']
+            )
+            scores[worst] = migrant_score
+    
+    def get_best(self) -> Tuple[PromptGenome, float]:
+        """Return the best individual across all islands and its score."""
+        if not any(self.scores):
+            raise RuntimeError("No island has been scored yet; call evolve() first")
+        return max(
+            (
+                best 
+                for population, scores in zip(self.populations, self.scores) 
+                for best in zip(population, scores)
+            ),
+            key=itemgetter(1)
+        )
@@ -6,14 +6,26 @@
 # Reference: Sheppard (2019), Ch. 2 - Fitness Function Design
 # =============================================================================
 
-import random
-import time
-from typing import Optional
-from genome import PromptGenome
+import asyncio
+import hashlib
+import shelve
+from collections import OrderedDict
+from contextlib import nullcontext
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from genome import PromptGenome, Population
 
 # Optional: Import Gemini for real evaluation
 # import google.generativeai as genai
 
+# Rate-limit error raised by the Gemini client (HTTP 429)
+try:
+    from google.api_core.exceptions import ResourceExhausted as RateLimitError
+except ImportError:
+    class RateLimitError(Exception):
+        """Stand-in for the provider's rate-limit error when the SDK is absent."""
+
 
 class Evaluator:
     """
@@ -22,78 +34,260 @@ class Evaluator:
     Fitness Score: Float between 0.0 (worst) and 10.0 (best).
     """
     
-    def __init__(self, use_mock: bool = True, api_key: Optional[str] = None):
+    # Upper bound on memoized scores, to keep long runs from growing unbounded
+    CACHE_MAX_SIZE = 10_000
+    
+    def __init__(
+        self, 
+        use_mock: bool = True, 
+        api_key: Optional[str] = None,
+        seed: Optional[int] = None,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        cache_dir: Optional[str] = None
+    ):
         """
         Initialize the evaluator.
         
         Args:
             use_mock: If True, use simulated scores (faster for development).
             api_key: Gemini API key for real evaluation (if use_mock=False).
+            seed: Optional seed for reproducible mock scores.
+            max_concurrency: Maximum in-flight API requests per batch.
+            max_retries: Attempts per request when rate-limited (>= 1).
+            cache_dir: Optional directory (e.g. ".cache") where scores are
+                also persisted, so they are reused across runs.
         """
+        if max_retries < 1:
+            raise ValueError(f"max_retries must be at least 1, got {max_retries!r}")
         self.use_mock = use_mock
         self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        # Private generator: reproducible when seeded, no shared global state
+        self._np_rng = np.random.default_rng(seed)
         self.eval_count = 0  # Track number of evaluations for debugging
+        self.cache_hits = 0
+        self.cache_dir = cache_dir
+        # LRU of memoized scores, keyed by a digest of (genome, task)
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        # Default task, with its digest precomputed for cache keys
+        self.set_task("Explain Python")
         
         # Optional: Configure Gemini if using real evaluation
         # if not use_mock and api_key:
         #     genai.configure(api_key=api_key)
     
-    def evaluate(self, genome: PromptGenome, task: str = "Explain Python") -> float:
+    def set_task(self, task: str) -> None:
+        """
+        Set the default task and precompute its digest, so scoring a
+        population for it does not re-hash the task text.
+        
+        Args:
+            task: The task/question used when evaluate calls omit one.
+        """
+        self.task = task
+        self._task_digest = self._digest_task(task)
+    
+    def evaluate(self, genome: PromptGenome, task: Optional[str] = None) -> float:
         """
         Evaluate a genome's fitness for a given task.
         
         Args:
             genome: The PromptGenome to evaluate.
-            task: The task/question to assess.
+            task: The task/question to assess (default: self.task).
             
         Returns:
             float: Fitness score (0.0 to 10.0).
         """
-        self.eval_count += 1
+        return self.evaluate_batch([genome], task)[0]
+    
+    def evaluate_batch(
+        self, 
+        genomes: List[PromptGenome], 
+        task: Optional[str] = None
+    ) -> List[float]:
+        """
+        Evaluate a whole population in one call.
+        Genomes already scored for this task are served from the cache;
+        the remaining real evaluations are fanned out concurrently, so a
+        generation costs about one API round-trip instead of one per individual.
         
-        if self.use_mock:
-            return self._mock_evaluate(genome, task)
+        Args:
+            genomes: The PromptGenomes to evaluate.
+            task: The task/question to assess (default: self.task).
+            
+        Returns:
+            List[float]: Fitness scores, in the same order as genomes.
+        """
+        if task is None or task == self.task:
+            task, task_digest = self.task, self._task_digest
         else:
-            return self._real_evaluate(genome, task)
+            task_digest = self._digest_task(task)
+        keys = [self._cache_key(genome, task_digest) for genome in genomes]
+        scores: List[Optional[float]] = [self._cache_get(key) for key in keys]
+        
+        # Only genomes never seen before reach the (expensive) evaluation
+        pending = {}
+        for i, key in enumerate(keys):
+            if scores[i] is None and key not in pending:
+                pending[key] = genomes[i]
+        
+        if pending:
+            # Scores resolved below, kept locally: a batch with more misses
+            # than CACHE_MAX_SIZE evicts some of them from the LRU again
+            found = {}
+            with self._open_disk_cache() as disk:
+                if disk is not None:
+                    # Scores persisted by previous runs
+                    for key in [key for key in pending if key in disk]:
+                        found[key] = disk[key]
+                        self._cache_put(key, found[key])
+                        self.cache_hits += 1
+                        del pending[key]
+                
+                if pending:
+                    self.eval_count += len(pending)
+                    
+                    if self.use_mock:
+                        new_scores = self._mock_evaluate_batch(
+                            list(pending.values())
+                        ).tolist()
+                    else:
+                        new_scores = asyncio.run(
+                            self._real_evaluate_batch(list(pending.values()), task)
+                        )
+                    
+                    for key, score in zip(pending, new_scores):
+                        found[key] = score
+                        self._cache_put(key, score)
+                        if disk is not None:
+                            disk[key] = score
+            
+            scores = [found[key] if score is None else score 
+                      for key, score in zip(keys, scores)]
+        
+        return scores
+    
+    @staticmethod
+    def _digest_task(task: str) -> str:
+        """Fixed-size hex digest of a task, the task half of a cache key."""
+        return hashlib.blake2b(task.encode(), digest_size=8).hexdigest()
     
-    def _mock_evaluate(self, genome: PromptGenome, task: str) -> float:
+    @staticmethod
+    def _cache_key(genome: PromptGenome, task_digest: str) -> str:
+        """Compact fixed-size cache key for a (genome, task) pair."""
+        return f"{genome.fingerprint:016x}{task_digest}"
+    
+    def _cache_get(self, key: str) -> Optional[float]:
+        """Look up a memoized score, marking it as recently used."""
+        score = self._cache.get(key)
+        if score is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+        return score
+    
+    def _cache_put(self, key: str, score: float) -> None:
+        """Memoize a score, evicting the least recently used past the limit."""
+        self._cache[key] = score
+        if len(self._cache) > self.CACHE_MAX_SIZE:
+            self._cache.popitem(last=False)
+    
+    def _open_disk_cache(self):
         """
-        Simulated evaluation for development/testing.
-        Produces plausible scores without API calls.
+        Open the persistent score store, or a no-op context without cache_dir.
+        Mock and real scores are kept in separate stores so they never mix.
         """
-        # Base score with some randomness
-        base_score = random.uniform(5.0, 8.0)
-        
-        # Bonus for "reasonable" temperature (exploration vs exploitation balance)
-        temp = genome.genes['temperature']
-        if 0.5 < temp < 0.8:
-            base_score += 1.0
+        if not self.cache_dir:
+            return nullcontext(None)
+        path = Path(self.cache_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        return shelve.open(str(path / ("eval-mock" if self.use_mock else "eval-real")))
+    
+    def _mock_evaluate_batch(self, genomes: List[PromptGenome]) -> np.ndarray:
+        """
+        Simulated evaluation for development/testing, vectorized with NumPy.
+        Produces plausible scores without API calls, one array operation per rule.
+        """
+        population = Population.from_genomes(genomes)
+        temps = population.temperatures
+        diverse = population.diverse_mask()
         
-        # Bonus for having diverse fragments (exploration)
-        if len(set(genome.genes['fragments'])) >= 2:
-            base_score += 0.5
+        # Base score with some randomness
+        scores = self._np_rng.uniform(5.0, 8.0, size=len(population))
+        # Bonus for "reasonable" temperature
+        scores += np.where((temps > 0.5) & (temps < 0.8), 1.0, 0.0)
+        # Bonus for having diverse fragments
+        scores += diverse * 0.5
         
         # Clamp to valid range
-        return min(10.0, max(0.0, base_score))
+        return np.clip(scores, 0.0, 10.0, out=scores)
     
-    def _real_evaluate(self, genome: PromptGenome, task: str) -> float:
+    async def _real_evaluate_batch(
+        self, 
+        genomes: List[PromptGenome], 
+        task: str
+    ) -> List[float]:
+        """Issue all real evaluations at once and wait for every score."""
+        # Created per batch: asyncio.run() starts a fresh event loop each time
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return list(await asyncio.gather(
+            *(self._real_evaluate_one(genome, task, semaphore) for genome in genomes)
+        ))
+    
+    async def _real_evaluate_one(
+        self, 
+        genome: PromptGenome, 
+        task: str, 
+        semaphore: asyncio.Semaphore
+    ) -> float:
+        """
+        Rate-limited real evaluation: at most max_concurrency requests in
+        flight, retried with exponential backoff (1s, 2s, ...) on HTTP 429.
+        """
+        async with semaphore:
+            for attempt in range(self.max_retries):
+                try:
+                    return await self._real_evaluate_async(genome, task)
+                except RateLimitError:
+                    if attempt == self.max_retries - 1:
+                        raise
+                    await asyncio.sleep(2 ** attempt)
+    
+    async def _real_evaluate_async(self, genome: PromptGenome, task: str) -> float:
         """
-        Real evaluation using Gemini API.
+        Real evaluation using Gemini API (async, so batches run concurrently).
         Note: Implement this when ready for production testing.
         """
         # TODO: Implement real LLM-based evaluation
         # 1. Render the prompt from genome
-        # 2. Send to Gemini with the task
+        # 2. await genai.GenerativeModel(...).generate_content_async(prompt)
         # 3. Ask Gemini to score the response 1-10
         # 4. Return the score
+        # For offline runs, all N prompts can instead be packed into a single
+        # Gemini batch request (~50% cheaper, higher latency).
         
         # Placeholder for now
-        time.sleep(0.1)  # Simulate API latency
+        await asyncio.sleep(0.1)  # Simulate API latency
         return 5.0
     
+    def clear_cache(self) -> None:
+        """Forget all memoized fitness scores (in memory; disk cache is kept)."""
+        self._cache.clear()
+    
+    def cache_info(self) -> dict:
+        """Return score-cache statistics (like functools.lru_cache)."""
+        return {
+            'hits': self.cache_hits,
+            'misses': self.eval_count,
+            'size': len(self._cache),
+            'maxsize': self.CACHE_MAX_SIZE
+        }
+    
     def get_stats(self) -> dict:
         """Return evaluation statistics for debugging."""
         return {
             'total_evaluations': self.eval_count,
+            'cache_hits': self.cache_hits,
             'mode': 'mock' if self.use_mock else 'real'
         }
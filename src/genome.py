@@ -6,9 +6,15 @@
 # Reference: Gridin (2021), Ch. 8; Kar & Ralte (2025), Ch. 12
 # =============================================================================
 
+import hashlib
 import random
-from typing import List, Dict, Any
-from pool import INSTRUCTION_POOL, ROLES, FORMATS, TONES
+from typing import List, Dict, Any, FrozenSet, Optional, Sequence, Tuple
+import numpy as np
+from pool import INSTRUCTION_POOL, N_INSTRUCTIONS, MODES, ROLES, FORMATS, TONES
+
+# Smallest integer type that can index INSTRUCTION_POOL (uint8 for <= 256
+# instructions): fragment arrays move 1 byte per gene instead of a PyObject
+FRAGMENT_DTYPE = np.min_scalar_type(N_INSTRUCTIONS - 1)
 
 
 class PromptGenome:
@@ -24,6 +30,11 @@ class PromptGenome:
     - render_prompt() -> str: The actual prompt sent to the LLM
     """
     
+    # Rendered prompts shared by all genomes, keyed by
+    # (fragments, rounded temperature, task)
+    _prompt_cache: Dict[tuple, str] = {}
+    _PROMPT_CACHE_MAX_SIZE = 4096
+    
     def __init__(self, genes: Dict[str, Any] = None):
         """
         Initialize a genome with given genes or generate random ones.
@@ -36,16 +47,70 @@ class PromptGenome:
         else:
             # Random initialization for initial population
             self.genes = self._generate_random_genes()
+        self._frag_set = None  # Lazily computed, see fragment_set
+        # Estimated fitness inherited from the parents (None = unknown)
+        self.parent_fitness: Optional[float] = None
+    
+    @classmethod
+    def _from_arrays(
+        cls, 
+        fragments: List[int], 
+        temperature: float, 
+        mode: str
+    ) -> 'PromptGenome':
+        """
+        Fast constructor for genes coming out of a Population.
+        Skips __init__ and sets the genes dict directly.
+        """
+        genome = object.__new__(cls)
+        genome.genes = {
+            'fragments': fragments,
+            'temperature': temperature,
+            'mode': mode
+        }
+        genome._frag_set = None
+        genome.parent_fitness = None
+        return genome
+    
+    @property
+    def fragment_set(self) -> FrozenSet[int]:
+        """Distinct fragment indices, built once until the genes change."""
+        if self._frag_set is None:
+            self._frag_set = frozenset(self.genes['fragments'])
+        return self._frag_set
+    
+    @property
+    def fingerprint(self) -> int:
+        """
+        64-bit BLAKE2b digest of the fitness identity (sorted fragments,
+        temperature to 2 decimals). Not cached, so it can never go stale
+        when genes are written directly.
+        """
+        digest = hashlib.blake2b(
+            repr(self._identity_key()).encode(), 
+            digest_size=8
+        ).digest()
+        return int.from_bytes(digest, 'little')
+    
+    def set_fragment(self, position: int, fragment: int) -> None:
+        """Replace one fragment gene, keeping derived data in sync."""
+        self.genes['fragments'][position] = fragment
+        self._genes_changed()
+    
+    def _genes_changed(self) -> None:
+        """Reset data derived from the genes after an in-place change."""
+        self._frag_set = None
+        self.parent_fitness = None
     
     def _generate_random_genes(self) -> Dict[str, Any]:
         """Generate a valid random genome for population initialization."""
         return {
             'fragments': random.sample(
-                range(len(INSTRUCTION_POOL)), 
-                k=min(3, len(INSTRUCTION_POOL))
+                range(N_INSTRUCTIONS), 
+                k=min(3, N_INSTRUCTIONS)
             ),
             'temperature': random.uniform(0.3, 0.9),
-            'mode': random.choice(['darwin', 'kropotkin'])
+            'mode': random.choice(MODES)
         }
     
     def render_prompt(self, task: str) -> str:
@@ -58,17 +123,29 @@ class PromptGenome:
         Returns:
             str: The complete prompt to send to the LLM.
         """
+        key = (
+            tuple(self.genes['fragments']), 
+            round(self.genes['temperature'], 2), 
+            task
+        )
+        prompt = self._prompt_cache.get(key)
+        if prompt is not None:
+            return prompt
+        
         # Translate fragment indices to actual instructions
-        instructions = " ".join([
-            INSTRUCTION_POOL[i] for i in self.genes['fragments']
-        ])
+        instructions = " ".join(map(INSTRUCTION_POOL.__getitem__, key[0]))
         
         # Construct final prompt
-        return (
+        prompt = (
             f"{instructions}. "
             f"Task: {task}. "
-            f"Temperature: {self.genes['temperature']:.2f}"
+            f"Temperature: {key[1]:.2f}"
         )
+        
+        if len(self._prompt_cache) >= self._PROMPT_CACHE_MAX_SIZE:
+            self._prompt_cache.clear()
+        self._prompt_cache[key] = prompt
+        return prompt
     
     def mutate(self, rate: float = 0.2) -> None:
         """
@@ -83,10 +160,8 @@ class PromptGenome:
         
         # Mutation Type 1: Discrete (fragment indices)
         if random.random() < 0.5 and self.genes['fragments']:
-            idx = random.randint(0, len(self.genes['fragments']) - 1)
-            self.genes['fragments'][idx] = random.randint(
-                0, len(INSTRUCTION_POOL) - 1
-            )
+            idx = random.randrange(len(self.genes['fragments']))
+            self.set_fragment(idx, random.randrange(N_INSTRUCTIONS))
         
         # Mutation Type 2: Real-valued (temperature)
         else:
@@ -94,6 +169,7 @@ class PromptGenome:
             new_temp = self.genes['temperature'] + noise
             # Clamp to valid range [0.0, 1.0]
             self.genes['temperature'] = max(0.0, min(1.0, new_temp))
+            self._genes_changed()
     
     def crossover(self, partner: 'PromptGenome') -> 'PromptGenome':
         """
@@ -129,6 +205,22 @@ class PromptGenome:
         """Generate a hashable key for caching fitness evaluations."""
         return f"{sorted(self.genes['fragments'])}_{self.genes['temperature']:.2f}"
     
+    def _identity_key(self) -> Tuple[Tuple[int, ...], float]:
+        """Tuple form of get_fitness_key (no string formatting) for hashing."""
+        return (
+            tuple(sorted(self.genes['fragments'])), 
+            round(self.genes['temperature'], 2)
+        )
+    
+    def __hash__(self) -> int:
+        return hash(self._identity_key())
+    
+    def __eq__(self, other: object) -> bool:
+        """Genomes are equal when they would receive the same fitness."""
+        if not isinstance(other, PromptGenome):
+            return NotImplemented
+        return self._identity_key() == other._identity_key()
+    
     def __str__(self) -> str:
         """Human-readable representation for debugging/logging."""
         return (
@@ -139,3 +231,145 @@ class PromptGenome:
     
     def __repr__(self) -> str:
         return f"PromptGenome(mode={self.genes['mode']}, temp={self.genes['temperature']:.2f})"
+
+
+class Population:
+    """
+    Structure-of-Arrays (SoA) layout for a whole generation.
+    
+    Each gene is stored as one column across all individuals instead of
+    one genes dict per individual, so population-wide operations become
+    single NumPy calls:
+    - fragments: np.ndarray (size, k) of FRAGMENT_DTYPE - indices into INSTRUCTION_POOL
+    - temperatures: np.ndarray (size,) - LLM temperature per individual
+    - modes: List[str] - 'darwin' or 'kropotkin' per individual
+    
+    PromptGenome objects are only materialized on demand (e.g. to render).
+    """
+    
+    def __init__(
+        self, 
+        fragments: np.ndarray, 
+        temperatures: np.ndarray, 
+        modes: Sequence[str]
+    ):
+        self.fragments = np.asarray(fragments, dtype=FRAGMENT_DTYPE)
+        self.temperatures = np.asarray(temperatures, dtype=np.float64)
+        self.modes = list(modes)
+    
+    @classmethod
+    def random(
+        cls, 
+        size: int, 
+        rng: np.random.Generator, 
+        num_fragments: int = 3
+    ) -> 'Population':
+        """Generate a random population (same distribution as PromptGenome())."""
+        k = min(num_fragments, N_INSTRUCTIONS)
+        
+        # Distinct fragments per individual, like random.sample: the indices
+        # of the k smallest random keys in each row, ordered by key
+        keys = rng.random((size, N_INSTRUCTIONS))
+        chosen = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(keys, chosen, axis=1).argsort(axis=1)
+        fragments = np.take_along_axis(chosen, order, axis=1)
+        
+        return cls(
+            fragments,
+            rng.uniform(0.3, 0.9, size=size),
+            [MODES[i] for i in rng.integers(0, len(MODES), size=size)]
+        )
+    
+    @classmethod
+    def from_genomes(cls, genomes: Sequence[PromptGenome]) -> 'Population':
+        """Pack a list of PromptGenomes into column arrays."""
+        return cls(
+            [g.genes['fragments'] for g in genomes],
+            [g.genes['temperature'] for g in genomes],
+            [g.genes['mode'] for g in genomes]
+        )
+    
+    def __len__(self) -> int:
+        return len(self.temperatures)
+    
+    def crossover(self, pairs: np.ndarray, mode: str) -> 'Population':
+        """
+        Batched single-point crossover, one child per row of pairs.
+        Same operator as PromptGenome.crossover, applied to all children at once.
+        
+        Args:
+            pairs: int array (n_children, 2) of parent row indices.
+            mode: Evolutionary mode assigned to every child.
+            
+        Returns:
+            Population: The children.
+        """
+        first, second = pairs[:, 0], pairs[:, 1]
+        mid_point = self.fragments.shape[1] // 2
+        
+        # First half of fragments from first parent, rest from second
+        child_fragments = np.concatenate(
+            [self.fragments[first, :mid_point], self.fragments[second, mid_point:]],
+            axis=1
+        )
+        # Blend crossover for temperature (average of parents)
+        child_temps = 0.5 * (self.temperatures[first] + self.temperatures[second])
+        
+        return Population(child_fragments, child_temps, [mode] * len(pairs))
+    
+    def mutate_batch(self, rate: float, rng: np.random.Generator) -> np.ndarray:
+        """
+        Batched PromptGenome.mutate: same operators, applied in place to
+        every individual with a handful of NumPy calls.
+        
+        Args:
+            rate: Probability of mutation occurring per individual.
+            rng: NumPy random generator.
+            
+        Returns:
+            np.ndarray: Boolean mask of the individuals that mutated.
+        """
+        n, k = self.fragments.shape
+        mutation_mask = rng.random(n) < rate
+        discrete = rng.random(n) < 0.5
+        
+        # Mutation Type 1: Discrete (fragment indices)
+        rows = np.flatnonzero(mutation_mask & discrete)
+        if k:
+            cols = rng.integers(0, k, size=rows.size)
+            self.fragments[rows, cols] = rng.integers(
+                0, N_INSTRUCTIONS, size=rows.size
+            )
+        
+        # Mutation Type 2: Real-valued (temperature), clamped to [0.0, 1.0]
+        rows = np.flatnonzero(mutation_mask & ~discrete)
+        self.temperatures[rows] = np.clip(
+            self.temperatures[rows] + rng.normal(0, 0.1, size=rows.size), 
+            0.0, 
+            1.0
+        )
+        
+        return mutation_mask
+    
+    def to_genomes(self) -> List[PromptGenome]:
+        """Materialize every individual as a PromptGenome."""
+        # Convert whole columns once instead of element by element
+        return [
+            PromptGenome._from_arrays(fragments, temperature, mode)
+            for fragments, temperature, mode in zip(
+                self.fragments.tolist(), self.temperatures.tolist(), self.modes
+            )
+        ]
+    
+    def diverse_mask(self) -> np.ndarray:
+        """Boolean mask of individuals with at least 2 distinct fragments."""
+        if N_INSTRUCTIONS > 64:
+            ordered = np.sort(self.fragments, axis=1)
+            return (ordered[:, 1:] != ordered[:, :-1]).any(axis=1)
+        
+        # One bit per instruction: at least 2 bits set <=> mask & (mask - 1) != 0
+        masks = np.bitwise_or.reduce(
+            np.uint64(1) << self.fragments.astype(np.uint64), 
+            axis=1
+        )
+        return (masks & (masks - np.uint64(1))) != 0
@@ -6,9 +6,12 @@
 # Reference: Gridin (2021), Ch. 8 - "Enumeration Encoding"
 # =============================================================================
 
+from typing import Tuple
+
 # Predefined instruction fragments for prompt construction
 # Each index represents a valid "instruction gene"
-INSTRUCTION_POOL = [
+# (a tuple: immutable, so it can never drift during a run)
+INSTRUCTION_POOL: Tuple[str, ...] = (
     "Be concise and direct",
     "Use practical examples",
     "Think step-by-step (Chain of Thought)",
@@ -19,7 +22,10 @@ INSTRUCTION_POOL = [
     "Act as a senior expert",
     "Act as a patient tutor",
     "Provide constructive criticism"
-]
+)
+
+# Number of instruction genes, computed once for hot paths
+N_INSTRUCTIONS = len(INSTRUCTION_POOL)
 
 # Available agent roles (categorical gene)
 ROLES = ["expert", "tutor", "critic", "assistant"]
@@ -30,9 +36,12 @@ FORMATS = ["markdown", "json", "plain_text", "bullet_points"]
 # Available tones (categorical gene)
 TONES = ["clinical", "friendly", "formal", "casual"]
 
+# Evolutionary strategies (categorical gene)
+MODES = ("darwin", "kropotkin")
+
 
 def get_instruction_by_index(index: int) -> str:
     """Safely retrieve instruction from pool by index."""
-    if 0 <= index < len(INSTRUCTION_POOL):
+    if 0 <= index < N_INSTRUCTIONS:
         return INSTRUCTION_POOL[index]
     return INSTRUCTION_POOL[0]  # Fallback to default
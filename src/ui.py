@@ -10,10 +10,12 @@ import json
 import time
 import random
 from pathlib import Path
+import numpy as np
+from typing import Optional
 
 # Import core modules
 from src.genome import PromptGenome
-from src.engine import EvolutionaryEngine
+from src.engine import EvolutionaryEngine, mean_fitness
 from src.evaluator import Evaluator
 from src.pool import INSTRUCTION_POOL
 
@@ -55,61 +57,179 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# st.fragment (st.experimental_fragment before 1.37) lets a panel rerun on its
+# own; older Streamlit releases render it as part of the full script run.
+_fragment = (
+    getattr(st, "fragment", None)
+    or getattr(st, "experimental_fragment", None)
+    or (lambda func: func)
+)
+
+
 # =============================================================================
 # SESSION STATE INITIALIZATION
 # =============================================================================
 
-def init_session_state():
-    """Initialize Streamlit session state for persistence across reruns."""
+def init_session_state(seed: Optional[int] = None):
+    """
+    Initialize Streamlit session state for persistence across reruns.
+    
+    Args:
+        seed: Optional seed to make demo runs reproducible.
+    """
+    if 'seed' not in st.session_state:
+        st.session_state.seed = seed
+        # Engine and evaluator draw from independent child streams
+        if seed is None:
+            st.session_state.engine_seed = st.session_state.evaluator_seed = None
+        else:
+            st.session_state.engine_seed, st.session_state.evaluator_seed = [
+                int(child.generate_state(1)[0])
+                for child in np.random.SeedSequence(seed).spawn(2)
+            ]
     if 'engine' not in st.session_state:
-        st.session_state.engine = EvolutionaryEngine(population_size=5)
+        st.session_state.engine = EvolutionaryEngine(
+            population_size=5, 
+            seed=st.session_state.engine_seed
+        )
     if 'population' not in st.session_state:
         st.session_state.population = st.session_state.engine.create_initial_population()
     if 'evaluator' not in st.session_state:
-        st.session_state.evaluator = Evaluator(use_mock=True)
+        st.session_state.evaluator = Evaluator(
+            use_mock=True, 
+            seed=st.session_state.evaluator_seed
+        )
     if 'generation' not in st.session_state:
         st.session_state.generation = 0
     if 'fitness_history' not in st.session_state:
-        st.session_state.fitness_history = []
-    if 'diversity_history' not in st.session_state:
-        st.session_state.diversity_history = []
-    if 'mode_history' not in st.session_state:
-        st.session_state.mode_history = []
+        reset_histories()
     if 'is_running' not in st.session_state:
         st.session_state.is_running = False
     if 'use_fallback' not in st.session_state:
         st.session_state.use_fallback = False
 
 
+# =============================================================================
+# HISTORY BUFFERS
+# Per-generation series live in preallocated arrays indexed by generation;
+# st.session_state.generation is the write index (entries [:generation] are valid).
+# Modes take one bit per generation in mode_bits (1 = kropotkin, little-endian).
+# =============================================================================
+
+HISTORY_CAPACITY = 1024
+
+
+def reset_histories(capacity: int = HISTORY_CAPACITY):
+    """Allocate empty fitness, diversity and mode history buffers."""
+    st.session_state.fitness_history = np.full(capacity, np.nan, dtype=np.float32)
+    st.session_state.diversity_history = np.zeros(capacity, dtype=np.int32)
+    st.session_state.mode_bits = np.zeros((capacity + 7) // 8, dtype=np.uint8)
+
+
+def record_generation(avg_fitness: float, diversity: int, mode: str):
+    """
+    Write one generation into the history buffers and advance the index.
+    
+    Buffers double in size when full, so appends stay amortized O(1).
+    """
+    gen = st.session_state.generation
+    if gen >= len(st.session_state.fitness_history):
+        grow = len(st.session_state.fitness_history)
+        st.session_state.fitness_history = np.concatenate(
+            [st.session_state.fitness_history, np.full(grow, np.nan, dtype=np.float32)]
+        )
+        st.session_state.diversity_history = np.concatenate(
+            [st.session_state.diversity_history, np.zeros(grow, dtype=np.int32)]
+        )
+        st.session_state.mode_bits = np.concatenate(
+            [st.session_state.mode_bits, np.zeros_like(st.session_state.mode_bits)]
+        )
+    
+    st.session_state.fitness_history[gen] = avg_fitness
+    st.session_state.diversity_history[gen] = diversity
+    st.session_state.mode_bits[gen >> 3] |= (mode == 'kropotkin') << (gen & 7)
+    st.session_state.generation = gen + 1
+
+
+def pack_modes(modes: list) -> np.ndarray:
+    """Pack a list of mode names into mode_bits layout."""
+    return np.packbits(
+        np.array([mode == 'kropotkin' for mode in modes], dtype=np.uint8), 
+        bitorder='little'
+    )
+
+
+def load_histories(fitness, diversity, mode_bits: np.ndarray):
+    """Replace the history buffers with saved series (e.g. fallback data)."""
+    count = len(fitness)
+    reset_histories(max(HISTORY_CAPACITY, count))
+    st.session_state.fitness_history[:count] = fitness
+    st.session_state.diversity_history[:count] = diversity[:count]
+    mode_bits = mode_bits[:(count + 7) // 8]
+    st.session_state.mode_bits[:len(mode_bits)] = mode_bits
+    st.session_state.generation = count
+
+
+def current_mode() -> str:
+    """Mode used by the most recent generation ('darwin' before the first)."""
+    gen = st.session_state.generation - 1
+    if gen >= 0 and (st.session_state.mode_bits[gen >> 3] >> (gen & 7)) & 1:
+        return 'kropotkin'
+    return 'darwin'
+
+
 # =============================================================================
 # FALLBACK DATA LOADER
+# Metadata (generation, population, commons) is a small JSON header; the
+# numeric histories go to a compressed .npz next to it, stored as raw arrays.
 # =============================================================================
 
+FALLBACK_HEADER_PATH = Path("data/fallback.json")
+FALLBACK_ARRAYS_PATH = Path("data/fallback.npz")
+
+
+@st.cache_data(ttl=3600)
 def load_fallback_data():
-    """Load pre-computed demo data for safe presentation."""
-    fallback_path = Path("data/fallback.json")
-    if fallback_path.exists():
-        with open(fallback_path, 'r') as f:
-            return json.load(f)
-    return None
+    """Load pre-computed demo data for safe presentation (cached per file)."""
+    if not FALLBACK_HEADER_PATH.exists():
+        return None
+    
+    with open(FALLBACK_HEADER_PATH, 'r') as f:
+        data = json.load(f)
+    
+    if FALLBACK_ARRAYS_PATH.exists():
+        with np.load(FALLBACK_ARRAYS_PATH) as arrays:
+            data['fitness_history'] = arrays['fitness']
+            data['diversity_history'] = arrays['diversity']
+            data['mode_bits'] = arrays['mode_bits']
+    else:
+        # Older all-JSON fallback: histories are lists, modes are names
+        data['mode_bits'] = pack_modes(data.pop('mode_history', []))
+    return data
 
 
 def save_fallback_data():
     """Save current state for future demo fallback."""
-    fallback_path = Path("data/fallback.json")
-    fallback_path.parent.mkdir(exist_ok=True)
-    
-    data = {
-        'generation': st.session_state.generation,
-        'fitness_history': st.session_state.fitness_history,
-        'diversity_history': st.session_state.diversity_history,
-        'mode_history': st.session_state.mode_history,
+    FALLBACK_HEADER_PATH.parent.mkdir(exist_ok=True)
+    
+    gen = st.session_state.generation
+    np.savez_compressed(
+        FALLBACK_ARRAYS_PATH,
+        fitness=st.session_state.fitness_history[:gen],
+        diversity=st.session_state.diversity_history[:gen],
+        mode_bits=st.session_state.mode_bits[:(gen + 7) // 8]
+    )
+    
+    header = {
+        'generation': gen,
         'population': [ind.genes for ind in st.session_state.population],
-        'commons': st.session_state.engine.commons
+        'commons': list(st.session_state.engine.commons)
     }
+    with open(FALLBACK_HEADER_PATH, 'w') as f:
+        json.dump(header, f, indent=2)
     
-    with open(fallback_path, 'w') as f:
-        json.dump(data, f, indent=2)
+    # Drop the cached copy so the next load sees the new file
+    load_fallback_data.clear()
 
 
 # =============================================================================
@@ -157,18 +277,17 @@ def render_metrics():
     col1, col2, col3, col4 = st.columns(4)
     
     # Calculate current metrics
-    if st.session_state.fitness_history:
-        avg_fitness = sum(st.session_state.fitness_history[-5:]) / len(st.session_state.fitness_history[-5:])
-        max_fitness = max(st.session_state.fitness_history)
+    fitness_history = st.session_state.fitness_history[:st.session_state.generation]
+    if fitness_history.size:
+        avg_fitness = float(fitness_history[-5:].mean())
+        max_fitness = float(fitness_history.max())
     else:
         avg_fitness = 0
         max_fitness = 0
     
-    # Calculate diversity
-    all_frags = []
-    for ind in st.session_state.population:
-        all_frags.extend(ind.genes['fragments'])
-    diversity = len(set(all_frags))
+    # Calculate diversity (maintained incrementally by the engine)
+    diversity = st.session_state.engine.get_diversity()
+    entropy = st.session_state.engine.get_fragment_entropy()
     
     # Commons size
     commons_size = len(set(st.session_state.engine.commons))
@@ -177,7 +296,7 @@ def render_metrics():
         st.metric(
             label="📈 Avg Fitness (last 5 gen)",
             value=f"{avg_fitness:.2f}",
-            delta=f"{max_fitness - avg_fitness:.2f}" if st.session_state.fitness_history else None
+            delta=f"{max_fitness - avg_fitness:.2f}" if fitness_history.size else None
         )
     
     with col2:
@@ -191,7 +310,8 @@ def render_metrics():
         st.metric(
             label="🧬 Genetic Diversity",
             value=f"{diversity} unique fragments",
-            delta=None
+            delta=None,
+            help=f"Fragment entropy: {entropy:.2f} bits"
         )
     
     with col4:
@@ -200,24 +320,24 @@ def render_metrics():
             value=f"{commons_size} shared",
             delta=None
         )
+    
+    # Fitness cache effectiveness
+    cache_info = st.session_state.evaluator.cache_info()
+    st.caption(
+        f"⚡ Score cache: {cache_info['hits']} hits / {cache_info['misses']} "
+        f"evaluations ({cache_info['size']}/{cache_info['maxsize']} cached)"
+    )
 
 
 def render_fitness_chart():
     """Display fitness evolution over generations."""
     st.markdown("### 📈 Fitness Evolution Over Time")
     
-    if st.session_state.fitness_history:
-        # Create chart data
-        chart_data = {
-            'Generation': list(range(len(st.session_state.fitness_history))),
-            'Avg Fitness': st.session_state.fitness_history
-        }
-        
-        st.line_chart(
-            chart_data,
-            x='Generation',
-            y='Avg Fitness'
-        )
+    gen = st.session_state.generation
+    if gen:
+        # Hand the buffer slice straight to the chart; its row index is
+        # the generation, so no separate x column is built
+        st.line_chart({'Avg Fitness': st.session_state.fitness_history[:gen]})
         
         # Add mode markers
         st.caption("🔴 Red phases = Darwin mode | 🟢 Green phases = Kropotkin mode")
@@ -254,10 +374,7 @@ def render_mode_explanation():
     """Explain the current evolutionary mode."""
     st.markdown("### 📖 How It Works")
     
-    # Get current mode from last generation
-    current_mode = st.session_state.mode_history[-1] if st.session_state.mode_history else 'darwin'
-    
-    if current_mode == 'darwin':
+    if current_mode() == 'darwin':
         st.markdown("""
         **🧬 Darwin Mode (Competition)**
         
@@ -290,6 +407,9 @@ def main():
     
     # Initialize session state
     init_session_state()
+    # Bind the session-state and sidebar proxies once per rerun
+    ss = st.session_state
+    sb = st.sidebar
     
     # Header
     st.title("🧬🤝 Prompt Synthesis")
@@ -297,29 +417,30 @@ def main():
     st.markdown("*Hackathon NYC 2025 | Self-Improving Agents Track*")
     
     # Sidebar controls
-    st.sidebar.header("⚙️ Controls")
+    sb.header("⚙️ Controls")
     
     # Fallback mode toggle
-    use_fallback = st.sidebar.checkbox(
+    use_fallback = sb.checkbox(
         "📦 Use Fallback Data (Demo Mode)",
-        value=st.session_state.use_fallback
+        value=ss.use_fallback
     )
-    st.session_state.use_fallback = use_fallback
+    ss.use_fallback = use_fallback
     
     if use_fallback:
         fallback_data = load_fallback_data()
         if fallback_data:
-            st.sidebar.success("✅ Fallback data loaded")
+            sb.success("✅ Fallback data loaded")
             # Load fallback into session state
-            st.session_state.fitness_history = fallback_data.get('fitness_history', [])
-            st.session_state.diversity_history = fallback_data.get('diversity_history', [])
-            st.session_state.mode_history = fallback_data.get('mode_history', [])
-            st.session_state.generation = fallback_data.get('generation', 0)
+            load_histories(
+                fallback_data.get('fitness_history', []),
+                fallback_data.get('diversity_history', []),
+                fallback_data['mode_bits']
+            )
         else:
-            st.sidebar.warning("⚠️ No fallback data found")
+            sb.warning("⚠️ No fallback data found")
     
     # Task selection
-    task = st.sidebar.selectbox(
+    task = sb.selectbox(
         "📝 Evaluation Task",
         [
             "Explain Python recursion",
@@ -328,79 +449,103 @@ def main():
             "Optimize this algorithm"
         ]
     )
+    evaluator = ss.evaluator
+    if task != evaluator.task:
+        evaluator.set_task(task)
     
-    # Evolution controls
-    st.sidebar.header("🚀 Evolution Controls")
-    
-    col1, col2 = st.sidebar.columns(2)
-    
-    with col1:
-        if st.button("▶️ Run 1 Generation", use_container_width=True):
-            # Evaluate current population
-            scores = [
-                st.session_state.evaluator.evaluate(ind, task)
-                for ind in st.session_state.population
-            ]
-            
-            # Determine mode based on diversity (simple heuristic)
-            all_frags = []
-            for ind in st.session_state.population:
-                all_frags.extend(ind.genes['fragments'])
-            diversity = len(set(all_frags))
-            
-            # Switch mode based on diversity
-            if diversity < 5:
-                mode = 'kropotkin'  # Low diversity → cooperate
-            else:
-                mode = 'darwin'  # High diversity → compete
-            
-            # Evolve
-            st.session_state.population = st.session_state.engine.evolve_generation(
-                st.session_state.population,
-                scores,
-                mode=mode
-            )
-            
-            # Update histories
-            st.session_state.generation += 1
-            st.session_state.fitness_history.append(sum(scores) / len(scores))
-            st.session_state.diversity_history.append(diversity)
-            st.session_state.mode_history.append(mode)
-            
-            st.rerun()
-    
-    with col2:
-        if st.button("🔄 Reset Population", use_container_width=True):
-            st.session_state.engine = EvolutionaryEngine(population_size=5)
-            st.session_state.population = st.session_state.engine.create_initial_population()
-            st.session_state.generation = 0
-            st.session_state.fitness_history = []
-            st.session_state.diversity_history = []
-            st.session_state.mode_history = []
-            st.rerun()
+    # Evolution controls (Run/Reset live in the evolution fragment)
+    sb.header("🚀 Evolution Controls")
     
     # Auto-run toggle
-    auto_run = st.sidebar.checkbox("⏱️ Auto-Run (5 sec/generation)")
+    auto_run = sb.checkbox("⏱️ Auto-Run (5 sec/generation)")
     
-    if auto_run and not st.session_state.is_running:
-        st.session_state.is_running = True
+    if auto_run and not ss.is_running:
+        ss.is_running = True
         # Note: Auto-run requires additional Streamlit configuration
     
     # Save fallback button
-    if st.sidebar.button("💾 Save Current State as Fallback"):
+    if sb.button("💾 Save Current State as Fallback"):
         save_fallback_data()
-        st.sidebar.success("✅ State saved!")
+        sb.success("✅ State saved!")
     
     # Main content area
     st.divider()
+    _evolution_fragment(task)
+    
+    # Footer
+    st.divider()
+    st.markdown("""
+    
+    **🔗 GitHub:** [github.com/your-username/prompt-synthesis](https://github.com)
+    """)
+
+
+def run_generation(task: str):
+    """Evaluate the current population and evolve it by one generation."""
+    ss = st.session_state
+    engine = ss.engine
+    
+    # Determine mode based on diversity (simple heuristic)
+    diversity = engine.get_diversity()
+    
+    # Switch mode based on diversity
+    if diversity < 5:
+        mode = 'kropotkin'  # Low diversity → cooperate
+    else:
+        mode = 'darwin'  # High diversity → compete
+    
+    # Evaluate current population and evolve
+    ss.population, scores = engine.evaluate_and_evolve(
+        ss.population,
+        ss.evaluator,
+        task,
+        mode=mode
+    )
+    
+    # Update histories
+    record_generation(
+        mean_fitness(np.asarray(scores, dtype=np.float64)),
+        diversity,
+        mode
+    )
+
+
+def reset_population():
+    """Start over with a fresh engine, population and empty histories."""
+    ss = st.session_state
+    ss.engine = EvolutionaryEngine(population_size=5, seed=ss.engine_seed)
+    ss.population = ss.engine.create_initial_population()
+    ss.generation = 0
+    reset_histories()
+
+
+@_fragment
+def _evolution_fragment(task: str):
+    """
+    Evolution buttons plus every panel an evolve click changes.
+    
+    As a fragment, a Run/Reset click reruns only this region; sidebar
+    changes (task, fallback toggle) still rerun the whole page.
+    """
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("▶️ Run 1 Generation", use_container_width=True):
+            run_generation(task)
+    
+    with col2:
+        if st.button("🔄 Reset Population", use_container_width=True):
+            reset_population()
+    
+    st.divider()
     
     # Row 1: Evolution Dial + Metrics
     col1, col2 = st.columns([1, 2])
     
     with col1:
-        current_mode = st.session_state.mode_history[-1] if st.session_state.mode_history else 'darwin'
-        balance = 80 if current_mode == 'kropotkin' else 20
-        render_evolution_dial(current_mode, balance)
+        mode = current_mode()
+        balance = 80 if mode == 'kropotkin' else 20
+        render_evolution_dial(mode, balance)
     
     with col2:
         render_metrics()
@@ -420,13 +565,6 @@ def main():
     
     # Row 3: Population Details
     render_population_table()
-    
-    # Footer
-    st.divider()
-    st.markdown("""
-    
-    **🔗 GitHub:** [github.com/your-username/prompt-synthesis](https://github.com)
-    """)
 
 
 if __name__ == "__main__":
@@ -5,8 +5,11 @@
 # Run with: python test_core.py
 # =============================================================================
 
-from engine import EvolutionaryEngine
-from evaluator import Evaluator
+import tempfile
+from collections import Counter
+
+from engine import EvolutionaryEngine, IslandEngine
+from evaluator import Evaluator, RateLimitError
 from genome import PromptGenome
 
 
@@ -33,35 +36,39 @@ def run_demo(generations: int = 3, use_mock: bool = True):
     for gen in range(generations):
         print(f"\n--- Generation {gen} ---")
         
-        # Evaluate current population
-        scores = []
-        for ind in population:
-            score = evaluator.evaluate(ind, task)
-            scores.append(score)
+        # Evaluate current population (cached / inherited scores are reused)
+        scores = engine.score_population(population, evaluator, task)
+        for ind, score in zip(population, scores):
             print(f"  Agent: {ind} | Fitness: {score:.2f}")
         
         # Alternate modes to test both strategies
         mode = 'darwin' if gen % 2 == 0 else 'kropotkin'
         print(f"  🔄 Mode: {mode.upper()}")
         
-        # Evolve to next generation
-        population = engine.evolve_generation(population, scores, mode=mode)
+        # Evolve to next generation (estimated scores come along for free)
+        population, scores = engine.evolve_generation_with_scores(
+            population, scores, mode=mode
+        )
         
         # Print Commons status (Kropotkin mode)
         if mode == 'kropotkin':
-            stats = engine.get_commons_stats()
-            print(f"  📦 Commons: {stats['unique_fragments']} unique fragments")
+            stats = engine.get_commons_stats(population)
+            print(
+                f"  📦 Commons: {stats['unique_fragments']} unique fragments "
+                f"({stats['commons_in_population']} in population)"
+            )
     
     # Final summary
     print("\n" + "=" * 60)
     print("✅ Functional Core Operational.")
     print(f"📊 Total evaluations: {evaluator.get_stats()['total_evaluations']}")
-    print(f"🧬 Final population diversity: {len(set(str(ind) for ind in population))}/{len(population)}")
+    print(f"🧬 Final population diversity: {len(set(population))}/{len(population)}")
     
-    # Show best individual
-    final_scores = [evaluator.evaluate(ind, task) for ind in population]
-    best_idx = final_scores.index(max(final_scores))
-    print(f"🏆 Best Agent: {population[best_idx]} | Score: {final_scores[best_idx]:.2f}")
+    # Show best individual (estimated scores from the last generation, no re-evaluation)
+    estimated = [(score, i) for i, score in enumerate(scores) if score is not None]
+    if estimated:
+        best_score, best_idx = max(estimated)
+        print(f"🏆 Best Agent: {population[best_idx]} | Est. Score: {best_score:.2f}")
 
 
 def run_quick_test():
@@ -83,6 +90,83 @@ def run_quick_test():
     score = evaluator.evaluate(genome)
     assert 0 <= score <= 10, f"Invalid score: {score}"
     
+    # Test fitness cache (same genome + task is scored only once)
+    assert evaluator.evaluate(genome) == score, "Cached score mismatch"
+    assert evaluator.get_stats()['total_evaluations'] == 1, "Cache was bypassed"
+    
+    # Test batch scoring (one vectorized pass over the whole population)
+    engine = EvolutionaryEngine(population_size=5)
+    population = engine.create_initial_population()
+    batch_scores = evaluator.evaluate_batch(population, "Test task")
+    assert len(batch_scores) == 5, "Batch size mismatch"
+    assert all(0 <= s <= 10 for s in batch_scores), f"Invalid scores: {batch_scores}"
+    assert evaluator.evaluate_batch(population, "Test task") == batch_scores, "Cached batch mismatch"
+    small_cache = Evaluator(use_mock=True)
+    small_cache.CACHE_MAX_SIZE = 2
+    assert len(small_cache.evaluate_batch(population, "Test task")) == 5, "Evicted scores lost"
+    
+    # Test on-disk score persistence (mock and real scores kept apart)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        first = Evaluator(use_mock=True, cache_dir=cache_dir)
+        stored = first.evaluate_batch(population, "Test task")
+        second = Evaluator(use_mock=True, cache_dir=cache_dir)
+        assert second.evaluate_batch(population, "Test task") == stored, "Disk scores differ"
+        assert second.eval_count == 0, "Disk cache was bypassed"
+        real_store = Evaluator(use_mock=False, cache_dir=cache_dir)
+        real_store.evaluate_batch(population, "Test task")
+        assert real_store.eval_count > 0, "Mock scores leaked into the real store"
+    
+    # Test rate-limit retries on real evaluation (API call stubbed out)
+    try:
+        Evaluator(use_mock=False, max_retries=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("max_retries=0 should be rejected")
+    real = Evaluator(use_mock=False, max_retries=2)
+    attempts = []
+    
+    async def flaky_api(genome, task):
+        attempts.append(genome)
+        if len(attempts) == 1:
+            raise RateLimitError("429 Too Many Requests")
+        return 7.0
+    
+    real._real_evaluate_async = flaky_api
+    assert real.evaluate_batch([genome], "Test task") == [7.0], "Retry lost the score"
+    assert len(attempts) == 2, f"Expected one retry, got {len(attempts) - 1}"
+    
+    # Test fused evaluate + evolve step
+    population, scores = engine.evaluate_and_evolve(population, evaluator, "Test task")
+    assert len(population) == 5 and len(scores) == 5, "Generation size changed"
+    all_frags = {f for ind in population for f in ind.genes['fragments']}
+    assert engine.get_diversity(population) == len(all_frags), "Diversity mismatch"
+    assert engine.get_diversity() == len(all_frags), "Incremental diversity drifted"
+    
+    # Test island model with migration
+    islands = IslandEngine(
+        num_islands=2, population_size=5, migration_interval=2, processes=1, seed=0
+    )
+    try:
+        islands.get_best()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("get_best() before evolve() should raise")
+    islands.evolve("Test task", generations=3)
+    assert all(len(pop) == 5 for pop in islands.populations), "Island size changed"
+    _, best_score = islands.get_best()
+    assert 0 <= best_score <= 10, f"Invalid best score: {best_score}"
+    for island, pop in zip(islands.islands, islands.populations):
+        counts = Counter(f for ind in pop for f in ind.genes['fragments'])
+        assert island.fragment_counter == counts, "Island fragment counts drifted"
+    try:
+        IslandEngine(num_islands=2, migration_interval=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("migration_interval=0 should be rejected")
+    
     print("✅ Quick validation passed.")
 
 